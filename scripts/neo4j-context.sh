@@ -223,7 +223,8 @@ populate_docs() {
     echo "Populating documentation graph for $PROJECT..."
     python3 ~/.claude/scripts/populate-doc-graph.py \
         --project "$PROJECT" \
-        --docs-path "$docs_path"
+        --docs-path "$docs_path" \
+        "$@"
 }
 
 # Populate code graph for current project
@@ -1378,7 +1379,7 @@ case "${1:-help}" in
         ;;
     populate|refresh)
         echo "🔄 Full refresh for $PROJECT..."
-        populate_docs
+        populate_docs --full
         populate_code
         echo "✅ Refresh complete"
         ;;
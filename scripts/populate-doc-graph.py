@@ -13,15 +13,23 @@ Example:
 """
 
 import argparse
+import hashlib
+import json
+import mmap
+import operator
 import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial, reduce
+from itertools import islice
 from pathlib import Path
 from typing import Optional
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 
 try:
     from neo4j import GraphDatabase
+    from neo4j.exceptions import ClientError
 except ImportError:
     print("ERROR: neo4j driver not installed. Run: pip install neo4j")
     sys.exit(1)
@@ -31,9 +39,103 @@ NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_USER = os.getenv("NEO4J_USER", "")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "")
 
-
-@dataclass
-class Document:
+# Driver settings tuned for bulk ingest
+DRIVER_CONFIG = {
+    "max_connection_pool_size": 50,
+    "connection_acquisition_timeout": 60,
+    "max_transaction_retry_time": 30,
+    "connection_timeout": 15,
+    "keep_alive": True,
+    "fetch_size": 1000,
+}
+
+# Cache of file mtime/size/hash per project and docs path, used to skip unchanged files
+CACHE_DIR = Path.home() / ".claude" / "graph-cache"
+
+# Rows sent per UNWIND query
+BATCH_SIZE = 1000
+
+# Concurrent writer sessions for the Document upsert phase
+WRITER_THREADS = 4
+
+# Indexes backing the MERGE/MATCH lookups in create_graph
+INDEXES = (
+    "CREATE INDEX doc_path IF NOT EXISTS FOR (d:Document) ON (d.path)",
+    "CREATE INDEX component_name IF NOT EXISTS FOR (c:Component) ON (c.name)",
+    "CREATE INDEX concept_name IF NOT EXISTS FOR (c:Concept) ON (c.name)",
+    "CREATE INDEX decision_path IF NOT EXISTS FOR (d:Decision) ON (d.path)",
+    "CREATE INDEX decision_id IF NOT EXISTS FOR (d:Decision) ON (d.id)",
+)
+
+# Markdown patterns, compiled once at import
+_TITLE_RE = re.compile(r'^#\s+(.+)$', re.MULTILINE)
+_HEADING_RE = re.compile(r'^#{1,3}\s+(.+)$', re.MULTILINE)
+_REF_RE = re.compile(r'\[.+?\]\(([^)]+\.md)\)')
+
+# ADR patterns
+_ADR_FILENAME_RE = re.compile(r'^(\d+)-(.+)$')
+_STATUS_RE = re.compile(r'Status:\s*(\w+)', re.IGNORECASE)
+# Context/Decision/Consequences sections (## or ###), each running up to the next heading
+_ADR_SECTION_RE = re.compile(
+    r'^#{2,3}\s+(Context|Decision|Consequences)[ \t]*\n(.*?)(?=^##|\Z)',
+    re.MULTILINE | re.DOTALL | re.IGNORECASE,
+)
+
+# Common component patterns in trading engine, joined into _DOC_SCAN below
+_COMPONENT_PATTERNS = (
+    r'TokenScreener|Screener',
+    r'RiskEngine|Risk Engine',
+    r'ExitEngine|Exit Engine',
+    r'TradeExecutor|Trade Executor|Executor',
+    r'Keystore|Key Store',
+    r'WebhookHandler|Webhook Handler',
+    r'CopyTradeWorker|Copy Trade Worker',
+    r'ExitCheckWorker|Exit Check Worker',
+    r'PriceUpdateWorker|Price Update Worker',
+    r'Jupiter|Helius|Birdeye',
+)
+
+# Components alone, for bodies with no markup for _DOC_SCAN to find
+_COMPONENT_RE = re.compile(r'\b(?:' + '|'.join(_COMPONENT_PATTERNS) + r')\b', re.IGNORECASE)
+
+# Document type markers (name or NN- prefix), in priority order
+_DOC_TYPES = ("overview", "architecture", "decision", "implementation", "operations", "plan")
+_DOC_TYPE_RANK = {
+    **{name: rank for rank, name in enumerate(_DOC_TYPES)},
+    **{prefix: rank for rank, prefix in enumerate(("00-", "01-", "02-", "04-", "05-", "06-"))},
+}
+_DOC_TYPE_RE = re.compile("|".join(_DOC_TYPE_RANK), re.IGNORECASE)
+
+# Bold terms (likely definitions); only 3-49 char spans are captured as
+# concepts, longer or shorter ones still match so pairing is kept
+_BOLD_RE = re.compile(r'\*\*(?:([^*]{3,49})|[^*]+)\*\*')
+
+# Single scanner for `code` and components. scan_markdown() dispatches on
+# m.lastgroup. Concept terms (3-49 chars, not starting with "/") are captured
+# as bt_text; longer or shorter spans still match through the fallback branch
+# so backtick pairing is kept. Headings, doc links and **bold** stay separate
+# passes (_HEADING_RE, _REF_RE, _BOLD_RE): an unpaired backtick, e.g. left
+# over from a ``` fence, would otherwise open a code span that cuts them off
+_DOC_SCAN = re.compile(
+    r'(?P<bt>`(?P<bt_inner>(?P<bt_text>(?!/)[^`]{3,49})|[^`]+)`)'
+    r'|(?P<comp>\b(?:' + '|'.join(_COMPONENT_PATTERNS) + r')\b)',
+    re.IGNORECASE,
+)
+
+# No per-instance __dict__ where supported (slots=True needs Python 3.10+)
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+class _PicklesAsTuple:
+    """Pickle as (cls, field values): smaller to ship back from parse workers."""
+    __slots__ = ()
+
+    def __reduce__(self):
+        return (self.__class__, tuple(getattr(self, f.name) for f in fields(self)))
+
+
+@dataclass(**_SLOTS)
+class Document(_PicklesAsTuple):
     """Represents a parsed markdown document."""
     path: str
     title: str
@@ -44,10 +146,11 @@ class Document:
     references: list[str] = field(default_factory=list)  # other doc paths referenced
     components: list[str] = field(default_factory=list)  # components mentioned
     concepts: list[str] = field(default_factory=list)  # key concepts
+    content_hash: str = ""  # blake2b of the file content, used to skip unchanged docs
 
 
-@dataclass
-class Decision:
+@dataclass(**_SLOTS)
+class Decision(_PicklesAsTuple):
     """Represents an ADR (Architecture Decision Record)."""
     id: str
     title: str
@@ -60,262 +163,453 @@ class Decision:
 
 def parse_frontmatter(content: str) -> tuple[dict, str]:
     """Extract YAML frontmatter from markdown content."""
-    if not content.startswith("---"):
+    if not content.startswith("---\n"):
         return {}, content
 
-    parts = content.split("---", 2)
-    if len(parts) < 3:
+    # Frontmatter is small; only look for the closing delimiter near the top
+    end = content.find("\n---", 3, 8192)
+    if end == -1:
         return {}, content
 
     frontmatter = {}
-    for line in parts[1].strip().split("\n"):
+    for line in content[4:end].splitlines():
         if ":" in line:
             key, value = line.split(":", 1)
             frontmatter[key.strip()] = value.strip()
 
-    return frontmatter, parts[2]
+    return frontmatter, content[end + 4:]
+
+
+def find_h1(content: str) -> Optional[str]:
+    """Return the text of the first H1 heading, if any."""
+    # Usually the document opens with its H1 (possibly after blank lines),
+    # which plain string checks can pick up without running the regex
+    start = 0
+    while content.startswith("\n", start):
+        start += 1
+    if content.startswith("# ", start):
+        end = content.find("\n", start)
+        text = content[start + 2:end if end != -1 else len(content)].lstrip()
+        if text:
+            return text
+
+    match = _TITLE_RE.search(content)
+    return match.group(1) if match else None
 
 
 def extract_title(content: str, path: str) -> str:
     """Extract document title from first H1 heading or filename."""
-    match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
-    if match:
-        return match.group(1).strip()
+    title = find_h1(content)
+    if title:
+        return title.strip()
     return Path(path).stem.replace("-", " ").title()
 
 
-def extract_headings(content: str) -> list[str]:
-    """Extract all headings from markdown content."""
-    return re.findall(r'^#{1,3}\s+(.+)$', content, re.MULTILINE)
-
-
-def extract_references(content: str, base_path: Path) -> list[str]:
-    """Extract references to other docs (relative links)."""
-    refs = []
-    # Match markdown links: [text](path.md) or [text](../path.md)
-    for match in re.finditer(r'\[.+?\]\(([^)]+\.md)\)', content):
-        ref_path = match.group(1)
-        if not ref_path.startswith("http"):
-            refs.append(ref_path)
-    return refs
-
-
-def extract_components(content: str) -> list[str]:
-    """Extract component names mentioned in the document."""
-    # Look for common component patterns in trading engine
-    patterns = [
-        r'\b(TokenScreener|Screener)\b',
-        r'\b(RiskEngine|Risk Engine)\b',
-        r'\b(ExitEngine|Exit Engine)\b',
-        r'\b(TradeExecutor|Trade Executor|Executor)\b',
-        r'\b(Keystore|Key Store)\b',
-        r'\b(WebhookHandler|Webhook Handler)\b',
-        r'\b(CopyTradeWorker|Copy Trade Worker)\b',
-        r'\b(ExitCheckWorker|Exit Check Worker)\b',
-        r'\b(PriceUpdateWorker|Price Update Worker)\b',
-        r'\b(Jupiter|Helius|Birdeye)\b',
-    ]
+def extract_status(content: str) -> str:
+    """Extract ADR status from "Status: <word>", defaulting to accepted."""
+    # The status line sits near the top of an ADR; find it with str.find
+    # and only fall back to the regex when that doesn't yield a word
+    hits = [i for i in (content.find(s, 0, 1024) for s in ("Status:", "status:", "STATUS:")) if i >= 0]
+    if hits:
+        start = min(hits) + 7
+        while start < len(content) and content[start].isspace():
+            start += 1
+        end = start
+        while end < len(content) and (content[end].isalnum() or content[end] == "_"):
+            end += 1
+        if end > start:
+            return content[start:end].lower()
+
+    match = _STATUS_RE.search(content)
+    return match.group(1).lower() if match else "accepted"
+
+
+def scan_markdown(content: str) -> tuple[list[str], list[str], list[str], list[str]]:
+    """Extract headings, doc references, components and concepts.
+
+    Headings, doc links and **bold** terms are found by their own regexes;
+    `code` and components share one scan. A component can sit inside `code`,
+    so the inner span of each backtick match is rescanned in place via
+    pos/endpos.
+    """
+    # Each pass is skipped when a literal its regex requires is absent; the
+    # checks are case-sensitive like the regexes, so they never disagree
+    headings = _HEADING_RE.findall(content) if "#" in content else []
+    # Skip external links ([text](http://...md))
+    refs = [ref for ref in _REF_RE.findall(content) if not ref.startswith("http")] if ".md)" in content else []
+    concepts = set(filter(None, _BOLD_RE.findall(content))) if "**" in content else set()
+
+    # Fast path: without a backtick no `code` can match, so only components
+    # need looking for
+    if "`" not in content:
+        components = {m.group(0).replace(" ", "") for m in _COMPONENT_RE.finditer(content)}
+        return headings, refs, list(components), sorted(concepts)[:20]
 
     components = set()
-    for pattern in patterns:
-        for match in re.finditer(pattern, content, re.IGNORECASE):
-            # Normalize component name
-            name = match.group(1).replace(" ", "")
-            components.add(name)
 
-    return list(components)
+    def scan(pos: int, endpos: int):
+        for m in _DOC_SCAN.finditer(content, pos, endpos):
+            if m.lastgroup == "comp":
+                # Normalize component name
+                components.add(m.group(0).replace(" ", ""))
+                continue
+
+            # Backtick terms; length limits are enforced by the regex, so
+            # any capture is a concept
+            term = m.group("bt_text")
+            if term:
+                concepts.add(term)
+            scan(*m.span("bt_inner"))
 
+    scan(0, len(content))
+    # Sorted so the limit picks the same concepts on every run (set order
+    # varies with string hash randomization, and re-runs MERGE onto old edges)
+    return headings, refs, list(components), sorted(concepts)[:20]  # Limit concepts to top 20
 
-def extract_concepts(content: str) -> list[str]:
-    """Extract key concepts/terms from the document."""
-    # Look for defined terms, code blocks, emphasis
-    concepts = set()
+def determine_doc_type(path: str) -> str:
+    """Determine document type from path."""
+    # One scan for every marker; the highest-priority type found wins
+    ranks = [_DOC_TYPE_RANK[m.group(0).lower()] for m in _DOC_TYPE_RE.finditer(path)]
+    return _DOC_TYPES[min(ranks)] if ranks else "other"
 
-    # Backtick terms
-    for match in re.finditer(r'`([^`]+)`', content):
-        term = match.group(1)
-        if len(term) > 2 and len(term) < 50 and not term.startswith("/"):
-            concepts.add(term)
 
-    # Bold terms (likely definitions)
-    for match in re.finditer(r'\*\*([^*]+)\*\*', content):
-        term = match.group(1)
-        if len(term) > 2 and len(term) < 50:
-            concepts.add(term)
+def read_markdown(file_path: Path) -> str:
+    """Read a markdown file via mmap, decoding straight from the mapped pages."""
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            content = str(mm, "utf-8")
 
-    return list(concepts)[:20]  # Limit to top 20
+    # Match read_text()'s universal newline handling
+    if "\r" in content:
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
+    return content
 
 
-def determine_doc_type(path: str) -> str:
-    """Determine document type from path."""
-    path_lower = path.lower()
-    if "overview" in path_lower or "00-" in path:
-        return "overview"
-    elif "architecture" in path_lower or "01-" in path:
-        return "architecture"
-    elif "decision" in path_lower or "02-" in path:
-        return "decision"
-    elif "implementation" in path_lower or "04-" in path:
-        return "implementation"
-    elif "operations" in path_lower or "05-" in path:
-        return "operations"
-    elif "plan" in path_lower or "06-" in path:
-        return "plan"
-    else:
-        return "other"
-
-
-def parse_document(file_path: Path, base_path: Path) -> Document:
+def parse_document(file_path: Path, base_path: Path, content: Optional[str] = None) -> Document:
     """Parse a markdown document into a Document object."""
-    content = file_path.read_text(encoding="utf-8")
+    if content is None:
+        content = read_markdown(file_path)
     rel_path = str(file_path.relative_to(base_path))
 
     frontmatter, body = parse_frontmatter(content)
+    headings, references, components, concepts = scan_markdown(body)
 
     return Document(
         path=rel_path,
         title=extract_title(body, rel_path),
         doc_type=determine_doc_type(rel_path),
-        headings=extract_headings(body),
+        headings=headings,
         content=body[:5000],  # Truncate for embedding
         frontmatter=frontmatter,
-        references=extract_references(body, file_path.parent),
-        components=extract_components(body),
-        concepts=extract_concepts(body),
+        references=references,
+        components=components,
+        concepts=concepts,
+        # Whole file, so frontmatter-only edits (e.g. an ADR status) count as changes
+        content_hash=hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest(),
     )
 
 
-def parse_decision(file_path: Path, base_path: Path) -> Optional[Decision]:
+def parse_decision(file_path: Path, base_path: Path, content: Optional[str] = None) -> Optional[Decision]:
     """Parse an ADR document into a Decision object."""
-    content = file_path.read_text(encoding="utf-8")
+    if content is None:
+        content = read_markdown(file_path)
     rel_path = str(file_path.relative_to(base_path))
 
     # Extract decision ID from filename (e.g., 001-go-for-trading-engine.md)
     filename = file_path.stem
-    match = re.match(r'^(\d+)-(.+)$', filename)
+    match = _ADR_FILENAME_RE.match(filename)
     if not match:
         return None
 
     decision_id = match.group(1)
 
     # Extract title from H1
-    title_match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
-    title = title_match.group(1) if title_match else filename
+    title = find_h1(content) or filename
 
     # Extract status (look for Status: in content)
-    status_match = re.search(r'Status:\s*(\w+)', content, re.IGNORECASE)
-    status = status_match.group(1).lower() if status_match else "accepted"
+    status = extract_status(content)
 
-    # Extract sections
-    context_match = re.search(r'## Context\s*\n(.*?)(?=\n##|\Z)', content, re.DOTALL | re.IGNORECASE)
-    decision_match = re.search(r'## Decision\s*\n(.*?)(?=\n##|\Z)', content, re.DOTALL | re.IGNORECASE)
-    consequences_match = re.search(r'## Consequences\s*\n(.*?)(?=\n##|\Z)', content, re.DOTALL | re.IGNORECASE)
+    # Extract sections in one pass (first occurrence of each wins)
+    sections = {}
+    for m in _ADR_SECTION_RE.finditer(content):
+        sections.setdefault(m.group(1).lower(), m.group(2).strip()[:2000])
 
     return Decision(
         id=decision_id,
         title=title,
         status=status,
         path=rel_path,
-        context=context_match.group(1).strip()[:2000] if context_match else "",
-        decision=decision_match.group(1).strip()[:2000] if decision_match else "",
-        consequences=consequences_match.group(1).strip()[:2000] if consequences_match else "",
+        context=sections.get("context", ""),
+        decision=sections.get("decision", ""),
+        consequences=sections.get("consequences", ""),
     )
 
 
-def run_query(driver, query: str, **params):
-    """Run a single query in its own session to avoid bookmark issues with NornicDB."""
+def _parse_one(md_file: Path, docs_path: Path) -> tuple[Optional[Document], Optional[Decision], Optional[str]]:
+    """Parse one markdown file in a worker process; returns (doc, decision, error)."""
+    # Skip README files at root
+    if md_file.name.upper() == "README.MD" and md_file.parent == docs_path:
+        return None, None, None
+
+    doc = dec = None
+    try:
+        # Read once, shared by both parsers
+        content = read_markdown(md_file)
+        doc = parse_document(md_file, docs_path, content)
+
+        # Check if it's a decision doc
+        if "decision" in md_file.parent.name.lower() or "02-" in str(md_file):
+            dec = parse_decision(md_file, docs_path, content)
+
+    except Exception as e:
+        return doc, dec, f"Failed to parse {md_file}: {e}"
+
+    return doc, dec, None
+
+
+def chunked(rows: list, size: int = BATCH_SIZE):
+    """Yield successive lists of at most `size` rows."""
+    it = iter(rows)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def write_batches(tx, query: str, rows: list):
+    """Run an UNWIND query over `rows` in batches on a single transaction."""
+    for chunk in chunked(rows):
+        tx.run(query, rows=chunk).consume()
+
+
+def write_parallel(driver, query: str, rows: list, bookmarks, workers: int = WRITER_THREADS):
+    """Split `rows` across `workers` threads, each writing through its own session.
+
+    Writers start after `bookmarks`; returns those combined with every writer's
+    bookmarks so a later session reads all of their writes.
+    """
+    def write(part: list):
+        with driver.session(bookmarks=bookmarks) as session:
+            session.execute_write(write_batches, query, part)
+            return session.last_bookmarks()
+
+    parts = [part for part in (rows[i::workers] for i in range(workers)) if part]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # reduce() consumes executor.map, so it re-raises the first writer exception
+        return reduce(operator.add, executor.map(write, parts), bookmarks)
+
+
+def manifest_path(project: str, docs_path: Path) -> Path:
+    """Cache file for this project/docs directory, kept out of the user's tree."""
+    key = hashlib.blake2b(str(docs_path).encode("utf-8"), digest_size=8).hexdigest()
+    return CACHE_DIR / f"{project}-{key}.json"
+
+
+def load_manifest(cache_path: Path, project: str) -> dict:
+    """Load the change cache: rel_path -> [mtime_ns, size, content_hash, references]."""
+    try:
+        data = json.loads(cache_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("project") != project:
+        return {}
+    # Entries in an older layout are dropped, so those files get reparsed
+    return {
+        path: entry for path, entry in data.get("files", {}).items()
+        if isinstance(entry, list) and len(entry) == 4
+    }
+
+
+def save_manifest(cache_path: Path, project: str, files: dict):
+    """Write the change cache atomically so an interrupted run can't corrupt it."""
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps({"project": project, "files": files}), encoding="utf-8")
+    os.replace(tmp_path, cache_path)
+
+
+def graph_has_documents(driver, project: str) -> bool:
+    """Check whether the project already has Document nodes in the graph."""
     with driver.session() as session:
-        return session.run(query, **params)
+        return session.run(f"MATCH (d:{project}:Document) RETURN d.path LIMIT 1").single() is not None
+
+
+def merge_references(session, project: str, rows: list[dict]):
+    """MERGE REFERENCES edges, letting APOC split the work into parallel batches.
+
+    Falls back to batched UNWIND in a single transaction when APOC isn't
+    installed or any APOC batch fails (the MERGE is idempotent either way).
+    """
+    if not rows:
+        return
+
+    query = f"""
+        UNWIND $rows AS row
+        MATCH (d1:{project}:Document {{path: row.from_path}})
+        MATCH (d2:{project}:Document {{path: row.to_path}})
+        MERGE (d1)-[:REFERENCES]->(d2)
+    """
+
+    try:
+        record = session.run(f"""
+            CALL apoc.periodic.iterate(
+                'UNWIND $rows AS row RETURN row',
+                'MATCH (d1:{project}:Document {{path: row.from_path}})
+                 MATCH (d2:{project}:Document {{path: row.to_path}})
+                 MERGE (d1)-[:REFERENCES]->(d2)',
+                {{batchSize: $batch_size, parallel: true, retries: 3, params: {{rows: $rows}}}}
+            ) YIELD failedBatches, errorMessages
+            RETURN failedBatches, errorMessages
+        """, rows=rows, batch_size=BATCH_SIZE).single()
+    except ClientError as e:
+        print(f"    APOC unavailable ({e.code}), using UNWIND batches")
+        session.execute_write(write_batches, query, rows)
+        return
+
+    if record["failedBatches"]:
+        print(f"    {record['failedBatches']} APOC batches failed ({record['errorMessages']}), retrying with UNWIND")
+        session.execute_write(write_batches, query, rows)
 
 
-def create_graph(driver, project: str, docs: list[Document], decisions: list[Decision]):
-    """Create the knowledge graph in NornicDB."""
+def create_graph(driver, project: str, docs: list[Document], decisions: list[Decision],
+                 paths: Optional[list[str]] = None, references: Optional[list[dict]] = None):
+    """Create the knowledge graph in NornicDB.
+
+    `docs` and `decisions` may be just the changed files; `paths` lists every
+    document still on disk (defaults to the docs given) and anything else is
+    removed from the graph. `references` holds the from/to rows of every
+    document on disk (defaults to those of `docs`), so links from unchanged
+    documents to new or restored ones are created too.
+
+    Uses one managed write transaction per phase, so each phase is committed
+    before the next one starts. The Document upsert is split across
+    WRITER_THREADS sessions; bookmarks chain the sessions so each phase sees
+    the previous phase's writes.
+    """
 
     print(f"Creating graph for project: {project}")
 
-    # Clear existing project nodes (optional - comment out to preserve)
-    print("  Clearing existing nodes...")
-    run_query(driver, f"""
-        MATCH (n:{project})
-        DETACH DELETE n
-    """)
-
-    # Create Document nodes
-    print(f"  Creating {len(docs)} Document nodes...")
-    for i, doc in enumerate(docs):
-        run_query(driver, f"""
-            CREATE (d:{project}:Document {{
-                path: $path,
-                title: $title,
-                type: $type,
-                headings: $headings,
-                content: $content
-            }})
-        """,
-            path=doc.path,
-            title=doc.title,
-            type=doc.doc_type,
-            headings=doc.headings,
-            content=doc.content[:2000]
-        )
-
-        # Create Component relationships
-        for comp in doc.components:
-            run_query(driver, f"""
-                MERGE (c:{project}:Component {{name: $name}})
-                WITH c
-                MATCH (d:{project}:Document {{path: $path}})
-                MERGE (d)-[:DESCRIBES]->(c)
-            """, name=comp, path=doc.path)
-
-        # Create Concept nodes and relationships
-        for concept in doc.concepts[:10]:  # Limit per doc
-            run_query(driver, f"""
-                MERGE (c:{project}:Concept {{name: $name}})
-                WITH c
-                MATCH (d:{project}:Document {{path: $path}})
-                MERGE (d)-[:MENTIONS]->(c)
-            """, name=concept, path=doc.path)
-
-        # Progress indicator
-        if (i + 1) % 10 == 0:
-            print(f"    Processed {i + 1}/{len(docs)} documents...")
-
-    # Create Decision nodes
-    print(f"  Creating {len(decisions)} Decision nodes...")
-    for dec in decisions:
-        run_query(driver, f"""
-            CREATE (d:{project}:Decision {{
-                id: $id,
-                title: $title,
-                status: $status,
-                path: $path,
-                context: $context,
-                decision: $decision,
-                consequences: $consequences
-            }})
-        """,
-            id=dec.id,
-            title=dec.title,
-            status=dec.status,
-            path=dec.path,
-            context=dec.context,
-            decision=dec.decision,
-            consequences=dec.consequences
-        )
-
-    # Create Document-to-Document references
-    print("  Creating document references...")
-    for doc in docs:
-        for ref in doc.references:
-            run_query(driver, f"""
-                MATCH (d1:{project}:Document {{path: $from_path}})
-                MATCH (d2:{project}:Document {{path: $to_path}})
-                MERGE (d1)-[:REFERENCES]->(d2)
-            """, from_path=doc.path, to_path=ref)
-
-    # Summary
+    rows = [
+        {
+            "path": doc.path,
+            "props": {
+                "title": doc.title,
+                "type": doc.doc_type,
+                "headings": doc.headings,
+                "content": doc.content[:2000],
+                "content_hash": doc.content_hash,
+            },
+        }
+        for doc in docs
+    ]
+
     with driver.session() as session:
+        # Schema changes can't share a transaction with writes, so run them first
+        print("  Ensuring indexes...")
+        for statement in INDEXES:
+            session.run(statement).consume()
+
+        # Remove documents and decisions that no longer exist on disk
+        print("  Removing stale nodes...")
+        if paths is None:
+            paths = [doc.path for doc in docs]
+        session.execute_write(lambda tx: tx.run(f"""
+            MATCH (n:{project})
+            WHERE (n:Document OR n:Decision) AND NOT n.path IN $paths
+            DETACH DELETE n
+        """, paths=paths).consume())
+
+        # Changed documents drop their outgoing edges so they can be rebuilt.
+        # Deleting an edge locks its target too, so this stays serial
+        session.execute_write(write_batches, f"""
+            UNWIND $rows AS row
+            MATCH (d:{project}:Document {{path: row.path}})
+            WHERE d.content_hash IS NULL OR d.content_hash <> row.props.content_hash
+            OPTIONAL MATCH (d)-[r:DESCRIBES|MENTIONS|REFERENCES]->()
+            DELETE r
+        """, rows)
+        bookmarks = session.last_bookmarks()
+
+    # Upsert Document nodes; unchanged content (same hash) is left untouched.
+    # Each writer only locks the Document nodes for its own paths
+    print(f"  Merging {len(docs)} Document nodes...")
+    bookmarks = write_parallel(driver, f"""
+        UNWIND $rows AS row
+        MERGE (d:{project}:Document {{path: row.path}})
+        WITH d, row
+        WHERE d.content_hash IS NULL OR d.content_hash <> row.props.content_hash
+        SET d += row.props
+    """, rows, bookmarks)
+
+    # Continue causally after every writer's commits
+    with driver.session(bookmarks=bookmarks) as session:
+        # Create each distinct Component/Concept once, then link documents to them
+        components = sorted({comp for doc in docs for comp in doc.components})
+        concepts = sorted({concept for doc in docs for concept in doc.concepts[:10]})  # Limit per doc
+
+        print(f"  Merging {len(components)} Component and {len(concepts)} Concept nodes...")
+        session.execute_write(write_batches, f"""
+            UNWIND $rows AS name
+            MERGE (:{project}:Component {{name: name}})
+        """, components)
+        session.execute_write(write_batches, f"""
+            UNWIND $rows AS name
+            MERGE (:{project}:Concept {{name: name}})
+        """, concepts)
+
+        print("  Creating component and concept relationships...")
+        session.execute_write(write_batches, f"""
+            UNWIND $rows AS row
+            MATCH (d:{project}:Document {{path: row.path}})
+            MATCH (c:{project}:Component {{name: row.name}})
+            MERGE (d)-[:DESCRIBES]->(c)
+        """, [{"path": doc.path, "name": comp} for doc in docs for comp in doc.components])
+        session.execute_write(write_batches, f"""
+            UNWIND $rows AS row
+            MATCH (d:{project}:Document {{path: row.path}})
+            MATCH (c:{project}:Concept {{name: row.name}})
+            MERGE (d)-[:MENTIONS]->(c)
+        """, [
+            {"path": doc.path, "name": concept}
+            for doc in docs
+            for concept in doc.concepts[:10]
+        ])
+
+        # Create Decision nodes
+        print(f"  Merging {len(decisions)} Decision nodes...")
+        session.execute_write(write_batches, f"""
+            UNWIND $rows AS row
+            MERGE (d:{project}:Decision {{path: row.path}})
+            SET d += row.props
+        """, [
+            {
+                "path": dec.path,
+                "props": {
+                    "id": dec.id,
+                    "title": dec.title,
+                    "status": dec.status,
+                    "context": dec.context,
+                    "decision": dec.decision,
+                    "consequences": dec.consequences,
+                },
+            }
+            for dec in decisions
+        ])
+
+        # Create Document-to-Document references
+        print("  Creating document references...")
+        if references is None:
+            references = [{"from_path": doc.path, "to_path": ref} for doc in docs for ref in doc.references]
+        merge_references(session, project, references)
+
+        # Drop components/concepts no document points at any more
+        session.execute_write(lambda tx: tx.run(f"""
+            MATCH (c:{project})
+            WHERE (c:Component OR c:Concept) AND NOT (c)<--()
+            DELETE c
+        """).consume())
+
+        # Summary
         result = session.run(f"""
             MATCH (n:{project})
             RETURN labels(n) as labels, count(*) as count
@@ -331,6 +625,7 @@ def main():
     parser.add_argument("--project", default="TradingEngine", help="Project label (e.g., TradingEngine)")
     parser.add_argument("--docs-path", default="./docs", help="Path to docs directory")
     parser.add_argument("--dry-run", action="store_true", help="Parse docs without writing to DB")
+    parser.add_argument("--full", action="store_true", help="Ignore the change cache and reprocess every file")
     args = parser.parse_args()
 
     docs_path = Path(args.docs_path).resolve()
@@ -338,63 +633,100 @@ def main():
         print(f"ERROR: Docs path not found: {docs_path}")
         sys.exit(1)
 
-    print(f"Scanning docs in: {docs_path}")
-
-    # Find all markdown files
-    md_files = list(docs_path.rglob("*.md"))
-    print(f"Found {len(md_files)} markdown files")
-
-    # Parse documents
-    docs = []
-    decisions = []
-
-    for md_file in md_files:
-        try:
-            # Skip README files at root
-            if md_file.name.upper() == "README.MD" and md_file.parent == docs_path:
-                continue
-
-            doc = parse_document(md_file, docs_path)
-            docs.append(doc)
+    driver = None
+    if not args.dry_run:
+        # Connect to NornicDB
+        print(f"Connecting to NornicDB at {NEO4J_URI}...")
+        auth = (NEO4J_USER, NEO4J_PASSWORD) if NEO4J_USER else None
+        driver = GraphDatabase.driver(NEO4J_URI, auth=auth, **DRIVER_CONFIG)
 
-            # Check if it's a decision doc
-            if "decision" in md_file.parent.name.lower() or "02-" in str(md_file):
-                dec = parse_decision(md_file, docs_path)
+    try:
+        cache_path = manifest_path(args.project, docs_path)
+        manifest = {}
+        if driver:
+            # Verify connection
+            driver.verify_connectivity()
+            print("Connected!\n")
+
+            # Only trust the cache while the graph still holds the project
+            if not args.full and graph_has_documents(driver, args.project):
+                manifest = load_manifest(cache_path, args.project)
+
+        print(f"Scanning docs in: {docs_path}")
+
+        # Files whose mtime and size match the cache are skipped before parsing;
+        # everything else is streamed from rglob into the worker pool
+        paths = []
+        stats = {}
+        files = {}
+
+        def changed_files():
+            for md_file in docs_path.rglob("*.md"):
+                rel_path = str(md_file.relative_to(docs_path))
+                try:
+                    st = md_file.stat()
+                except OSError as e:
+                    # Dangling symlink (e.g. an editor lock file) or removed mid-walk
+                    print(f"  Warning: Skipping {md_file}: {e}")
+                    continue
+                paths.append(rel_path)
+                stats[rel_path] = [st.st_mtime_ns, st.st_size]
+                cached = manifest.get(rel_path)
+                if cached and cached[:2] == stats[rel_path]:
+                    files[rel_path] = cached
+                    continue
+                yield md_file
+
+        # Parse documents in parallel (each file is independent)
+        docs = []
+        decisions = []
+
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            results = executor.map(partial(_parse_one, docs_path=docs_path), changed_files(), chunksize=16)
+            for doc, dec, error in results:
+                if error:
+                    print(f"  Warning: {error}")
+                if not doc:
+                    continue
+
+                # Touched but identical content: refresh the cache entry only
+                files[doc.path] = stats[doc.path] + [doc.content_hash, doc.references]
+                cached = manifest.get(doc.path)
+                if cached and cached[2] == doc.content_hash:
+                    continue
+
+                docs.append(doc)
                 if dec:
                     decisions.append(dec)
 
-        except Exception as e:
-            print(f"  Warning: Failed to parse {md_file}: {e}")
-
-    print(f"Parsed {len(docs)} documents, {len(decisions)} decisions")
-
-    if args.dry_run:
-        print("\nDry run - not writing to database")
-        print("\nSample documents:")
-        for doc in docs[:5]:
-            print(f"  - {doc.path}: {doc.title} ({doc.doc_type})")
-            print(f"    Components: {doc.components}")
-            print(f"    Concepts: {doc.concepts[:5]}")
-        return
-
-    # Connect to NornicDB
-    print(f"\nConnecting to NornicDB at {NEO4J_URI}...")
-    auth = (NEO4J_USER, NEO4J_PASSWORD) if NEO4J_USER else None
-    driver = GraphDatabase.driver(NEO4J_URI, auth=auth)
+        print(f"Found {len(paths)} markdown files")
+        print(f"Parsed {len(docs)} changed documents, {len(decisions)} decisions "
+              f"({len(files) - len(docs)} unchanged)")
 
-    try:
-        # Verify connection
-        driver.verify_connectivity()
-        print("Connected!")
+        if args.dry_run:
+            print("\nDry run - not writing to database")
+            print("\nSample documents:")
+            for doc in docs[:5]:
+                print(f"  - {doc.path}: {doc.title} ({doc.doc_type})")
+                print(f"    Components: {doc.components}")
+                print(f"    Concepts: {doc.concepts[:5]}")
+            return
 
         # Create the graph
-        create_graph(driver, args.project, docs, decisions)
+        # Every document's references are resent (MERGE is idempotent), so an
+        # unchanged doc's link to a new or restored file gets its edge
+        references = [
+            {"from_path": path, "to_path": ref} for path, entry in files.items() for ref in entry[3]
+        ]
+        create_graph(driver, args.project, docs, decisions, paths, references)
+        save_manifest(cache_path, args.project, files)
 
         print("\nDone! Graph populated successfully.")
         print(f"View in browser: http://localhost:7474")
 
     finally:
-        driver.close()
+        if driver:
+            driver.close()
 
 
 if __name__ == "__main__":
@@ -36,6 +36,7 @@ rm -f "$CLAUDE_DIR/scripts/neo4j-context.sh"
 rm -f "$CLAUDE_DIR/scripts/populate-doc-graph.py"
 rm -f "$CLAUDE_DIR/scripts/populate-code-graph.go"
 rm -f "$HOME/.local/bin/claude-graph"
+rm -rf "$CLAUDE_DIR/graph-cache"
 echo "  ✓ Scripts removed"
 
 echo ""